@@ -0,0 +1,316 @@
+"""Disk-backed document store: page text in a SQLite shard, metadata and search index in memory."""
+import atexit
+import gc
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from rapidfuzz import fuzz
+
+SHARD_DIR = os.path.join("data", "shards")
+PAGE_BATCH_SIZE = 64
+MMAP_SIZE = 1 << 30
+LARGE_DOCUMENT_SIZE = 1_000_000
+SEGMENT_SIZE = 64 * 1024
+CHUNK_SIZE = 4000
+CHUNK_OVERLAP = 200
+WORD_RE = re.compile(r"\w+")
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in", "is",
+    "it", "of", "on", "or", "that", "the", "this", "to", "was", "were", "with",
+})
+
+class DocMeta(NamedTuple):
+    """Metadata for one loaded document, as returned by DocumentStore.get_metadata."""
+    filepath: str
+    upload_time: int  # time.time_ns(), formatted only for display
+    length: int
+    type: str
+
+class DocumentStore:
+    """Keeps metadata in memory and streams page text into an on-disk SQLite shard.
+
+    Page text is stored as UTF-8 bytes, so one non-ASCII character does not widen a whole
+    document. The joined text is also cut into fixed-size segments so a character range can be
+    read without loading the whole document. Only the most recently read documents are held in
+    memory, in a small LRU cache.
+    """
+    def __init__(self, shard_dir: str = SHARD_DIR, cache_size: int = 8):
+        self.shard_dir = shard_dir
+        self.shard_path: Optional[str] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        # Metadata is kept column-wise: one dense array per field, indexed via id_to_idx
+        self.ids: List[str] = []
+        self.filepaths: List[str] = []
+        self.upload_times = array('q')
+        self.lengths = array('q')
+        self.types: List[str] = []
+        self.id_to_idx: Dict[str, int] = {}
+        # Inverted index: lowercase token -> ids of documents containing it
+        self.index: Dict[str, set] = defaultdict(set)
+        # Indexed tokens of each document, so a reload only touches its own posting sets
+        self.doc_tokens: Dict[str, frozenset] = {}
+        self.stopwords = STOPWORDS
+        # Sorted index keys for prefix lookups, rebuilt lazily after documents change
+        self.vocabulary: Optional[List[str]] = None
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        # Chunk boundaries as (start, end) offsets; the text itself is read back with read()
+        self.chunks: Dict[str, List[Tuple[int, int]]] = {}
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Opened on first use, so importing this module (e.g. in a worker process) touches no files
+        if self._conn is None:
+            os.makedirs(self.shard_dir, exist_ok=True)
+            # One shard file per store: metadata lives in memory, so the pages mean nothing to
+            # another process, and sessions sharing a working directory must not collide
+            fd, self.shard_path = tempfile.mkstemp(prefix="pages-", suffix=".db", dir=self.shard_dir)
+            os.close(fd)
+            self._conn = sqlite3.connect(self.shard_path)
+            # Read pages through a memory map, so the OS page cache holds them rather than our heap
+            self._conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+            # Case-folded text per page for search, and the original text as fixed-size segments
+            self._conn.execute(
+                "CREATE TABLE pages (doc_id TEXT, page INTEGER, folded BLOB, PRIMARY KEY (doc_id, page))"
+            )
+            self._conn.execute(
+                "CREATE TABLE segments (doc_id TEXT, start INTEGER, content BLOB, PRIMARY KEY (doc_id, start))"
+            )
+            atexit.register(self.close)
+        return self._conn
+
+    def close(self):
+        """Close the shard and delete its file."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+            os.remove(self.shard_path)
+
+    def add_document(self, document_id: str, pages: Iterable[str], filepath: str):
+        # The id is repeated in every posting set of the index, share one copy
+        document_id = sys.intern(document_id)
+
+        # Stage the new pages in one transaction and its tokens locally, so a loader that fails
+        # partway leaves any previous version of the document untouched
+        length = 0
+        tokens = set()
+        with self.conn:
+            self.conn.execute("DELETE FROM pages WHERE doc_id = ?", (document_id,))
+            self.conn.execute("DELETE FROM segments WHERE doc_id = ?", (document_id,))
+            page_batch = []
+            segment_batch = []
+            # Text not yet written as a segment, and its offset in the joined document
+            pending = ""
+            pending_start = 0
+            for page_no, page in enumerate(pages):
+                # Documents are immutable once added, so case-fold them once here
+                folded = page.lower()
+                tokens.update(WORD_RE.findall(folded))
+                page_batch.append((document_id, page_no, folded.encode("utf-8")))
+
+                # Pages are joined with a newline, as get_document returns them
+                pending += "\n" + page if page_no else page
+                length += len(page) + (1 if page_no else 0)
+                cut = len(pending) - len(pending) % SEGMENT_SIZE
+                for i in range(0, cut, SEGMENT_SIZE):
+                    segment = pending[i:i + SEGMENT_SIZE].encode("utf-8")
+                    segment_batch.append((document_id, pending_start + i, segment))
+                pending = pending[cut:]
+                pending_start += cut
+
+                if len(page_batch) >= PAGE_BATCH_SIZE or len(segment_batch) >= PAGE_BATCH_SIZE:
+                    self._flush(page_batch, segment_batch)
+            if pending:
+                segment_batch.append((document_id, pending_start, pending.encode("utf-8")))
+            self._flush(page_batch, segment_batch)
+        gc.collect()
+
+        idx = self.id_to_idx.get(document_id)
+        if idx is not None:
+            self._remove_from_index(document_id)
+        self.doc_tokens[document_id] = frozenset(tokens - self.stopwords)
+        for token in self.doc_tokens[document_id]:
+            self.index[token].add(document_id)
+        self.cache.pop(document_id, None)
+        self.chunks.pop(document_id, None)
+        self.vocabulary = None
+
+        upload_time = time.time_ns()
+        filetype = sys.intern(filepath.split('.')[-1])
+        if idx is None:
+            self.id_to_idx[document_id] = len(self.ids)
+            self.ids.append(document_id)
+            self.filepaths.append(filepath)
+            self.upload_times.append(upload_time)
+            self.lengths.append(length)
+            self.types.append(filetype)
+        else:
+            self.filepaths[idx] = filepath
+            self.upload_times[idx] = upload_time
+            self.lengths[idx] = length
+            self.types[idx] = filetype
+
+    def _remove_from_index(self, document_id: str):
+        for token in self.doc_tokens.pop(document_id, ()):
+            postings = self.index[token]
+            postings.discard(document_id)
+            if not postings:
+                del self.index[token]
+
+    def _flush(self, page_batch: List[tuple], segment_batch: List[tuple]):
+        self.conn.executemany("INSERT INTO pages VALUES (?, ?, ?)", page_batch)
+        self.conn.executemany("INSERT INTO segments VALUES (?, ?, ?)", segment_batch)
+        page_batch.clear()
+        segment_batch.clear()
+
+    def _iter_pages(self, document_id: str) -> Iterator[bytes]:
+        """Yield the case-folded text of each page."""
+        rows = self.conn.execute(
+            "SELECT folded FROM pages WHERE doc_id = ? ORDER BY page", (document_id,)
+        )
+        for (folded,) in rows:
+            yield folded
+
+    def get_document(self, document_id: str) -> Optional[str]:
+        if document_id not in self.id_to_idx:
+            return None
+
+        content = self.cache.get(document_id)
+        if content is not None:
+            self.cache.move_to_end(document_id)
+            return content.decode("utf-8")
+
+        rows = self.conn.execute(
+            "SELECT content FROM segments WHERE doc_id = ? ORDER BY start", (document_id,)
+        )
+        content = b"".join(segment for (segment,) in rows)
+        # Large documents are re-read from the mapped shard instead of pinned in the cache
+        if len(content) <= LARGE_DOCUMENT_SIZE:
+            self.cache[document_id] = content
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return content.decode("utf-8")
+
+    def read(self, document_id: str, start: int, end: int) -> Optional[str]:
+        """Return characters [start, end) of the document, reading only the segments that overlap."""
+        if document_id not in self.id_to_idx:
+            return None
+
+        # Segments start at multiples of SEGMENT_SIZE, so the first one needed is known upfront
+        first = start - start % SEGMENT_SIZE
+        rows = self.conn.execute(
+            "SELECT content FROM segments WHERE doc_id = ? AND start >= ? AND start < ? ORDER BY start",
+            (document_id, first, end),
+        )
+        text = "".join(segment.decode("utf-8") for (segment,) in rows)
+        return text[start - first:end - first]
+
+    def get_chunk_spans(self, document_id: str) -> Optional[List[Tuple[int, int]]]:
+        """Split the document into chunks once and return their character offsets."""
+        spans = self.chunks.get(document_id)
+        if spans is not None:
+            return spans
+
+        content = self.get_document(document_id)
+        if content is None:
+            return None
+        # Imported on first use, like the document loaders
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True
+        )
+        spans = [
+            (chunk.metadata["start_index"], chunk.metadata["start_index"] + len(chunk.page_content))
+            for chunk in splitter.create_documents([content])
+        ]
+        self.chunks[document_id] = spans
+        return spans
+
+    def get_metadata(self, document_id: str) -> Optional[DocMeta]:
+        idx = self.id_to_idx.get(document_id)
+        if idx is None:
+            return None
+        return DocMeta(self.filepaths[idx], self.upload_times[idx], self.lengths[idx], self.types[idx])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows(self, document_ids: Optional[Iterable[str]] = None) -> Iterator[tuple]:
+        """Yield (id, type, length, upload_time) for the given documents, or for all of them."""
+        if document_ids is None:
+            # Sweep the metadata columns directly rather than looking up each document
+            yield from zip(self.ids, self.types, self.lengths, self.upload_times)
+            return
+        for doc_id in document_ids:
+            idx = self.id_to_idx[doc_id]
+            yield doc_id, self.types[idx], self.lengths[idx], self.upload_times[idx]
+
+    def prefix_search(self, prefix: str) -> List[str]:
+        """Find documents containing a word that starts with the prefix, ignoring case."""
+        if self.vocabulary is None:
+            self.vocabulary = sorted(self.index)
+
+        prefix = prefix.lower()
+        matches = set()
+        for i in range(bisect_left(self.vocabulary, prefix), len(self.vocabulary)):
+            token = self.vocabulary[i]
+            if not token.startswith(prefix):
+                break
+            matches |= self.index[token]
+        return [doc_id for doc_id in self.ids if doc_id in matches]
+
+    def fuzzy_search(self, needle: str, score_cutoff: float = 80) -> List[str]:
+        """Find documents with a passage approximately matching the needle, best match first."""
+        needle = needle.lower()
+        if not needle:
+            return []
+        # Carry the end of the previous page into the next, so matches spanning a page break count
+        overlap = len(needle) - 1
+        scores = {}
+        for doc_id in self.ids:
+            best = 0.0
+            tail = ""
+            for page_no, page in enumerate(self._iter_pages(doc_id)):
+                text = tail + "\n" + page.decode("utf-8") if page_no else page.decode("utf-8")
+                # partial_ratio aligns the shorter string inside the longer one, so text shorter
+                # than the needle (a page number, a short CSV row) would score 100 if the needle
+                # merely contains it; compare such text as a whole instead
+                scorer = fuzz.partial_ratio if len(text) >= len(needle) else fuzz.ratio
+                best = max(best, scorer(needle, text, score_cutoff=score_cutoff))
+                if best == 100:
+                    break
+                tail = text[len(text) - overlap:]
+            if best:
+                scores[doc_id] = best
+        return sorted(scores, key=scores.get, reverse=True)
+
+    def search_documents(self, keyword: str) -> List[str]:
+        """Find documents containing the keyword as whole words, ignoring case."""
+        needle = keyword.lower()
+        tokens = [token for token in WORD_RE.findall(needle) if token not in self.stopwords]
+        if not tokens:
+            # Nothing indexable (e.g. only stopwords or punctuation), scan every document
+            candidates = self.id_to_idx.keys()
+        else:
+            candidates = set.intersection(*(self.index.get(token, set()) for token in tokens))
+            if len(tokens) == 1 and needle == tokens[0]:
+                return [doc_id for doc_id in self.ids if doc_id in candidates]
+
+        # Phrases: confirm the words actually appear together, only on candidate documents.
+        # Documents shorter than the keyword cannot match, so skip them before touching disk.
+        encoded = needle.encode("utf-8")
+        return [
+            doc_id for doc_id, length in zip(self.ids, self.lengths)
+            if doc_id in candidates
+            and len(needle) <= length
+            and any(encoded in page for page in self._iter_pages(doc_id))
+        ]
@@ -0,0 +1,61 @@
+"""Document loaders, kept free of import-time side effects so worker processes can import them."""
+import importlib
+import os
+from typing import Iterator, List
+
+from langchain_core.documents import Document
+
+class PdfiumLoader:
+    """Loads a PDF page by page with pypdfium2, which extracts text in native code."""
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+
+    def lazy_load(self) -> Iterator[Document]:
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(self.filepath)
+        try:
+            for page_no in range(len(pdf)):
+                page = pdf[page_no]
+                textpage = page.get_textpage()
+                try:
+                    text = textpage.get_text_range()
+                finally:
+                    textpage.close()
+                    page.close()
+                yield Document(page_content=text, metadata={"source": self.filepath, "page": page_no})
+        finally:
+            pdf.close()
+
+    def load(self) -> List[Document]:
+        return list(self.lazy_load())
+
+def _lazy_loader(module: str, name: str):
+    # Loader modules pull in heavy parsers (unstructured, nltk, ...), so import only on first use
+    def create(filepath: str):
+        loader_class = getattr(importlib.import_module(f"langchain_community.document_loaders.{module}"), name)
+        return loader_class(filepath)
+    return create
+
+# File extension -> loader factory; anything unlisted is read as plain text
+LOADERS = {
+    ".txt": _lazy_loader("text", "TextLoader"),
+    ".pdf": PdfiumLoader,
+    ".docx": _lazy_loader("word_document", "UnstructuredWordDocumentLoader"),
+    ".csv": _lazy_loader("csv_loader", "CSVLoader"),
+}
+
+def read_pages(filepath: str) -> Iterator[str]:
+    ext = os.path.splitext(filepath)[1].lower()
+    loader = LOADERS.get(ext, LOADERS[".txt"])(filepath)
+    return (doc.page_content for doc in loader.lazy_load())
+
+def load_pages(filepath: str):
+    """Parse a file in a worker process and return (filepath, pages, error).
+
+    Only parses: the caller adds the pages to its store, so the store is never pickled.
+    """
+    try:
+        return filepath, list(read_pages(filepath)), None
+    except Exception as e:
+        return filepath, None, str(e)
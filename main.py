@@ -1,160 +1,193 @@
 import os
-from langchain_anthropic import ChatAnthropic
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.tools import Tool, StructuredTool
-from langchain_community.document_loaders import (
-    TextLoader, 
-    PyPDFLoader, 
-    UnstructuredWordDocumentLoader,
-    CSVLoader
-)
+import io
+from concurrent.futures import ProcessPoolExecutor
 import json
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Any
 import re
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
+from document_store import DocumentStore
+from loaders import load_pages, read_pages
 
 class LoadDocumentInput(BaseModel):
     """Input for loading a document. """
     filepath: str = Field(description="The full path to the document file")
 
+class LoadDocumentsInput(BaseModel):
+    """Input for loading several documents at once."""
+    filepaths: List[str] = Field(description="The full paths to the document files")
+
+class PrefixSearchInput(BaseModel):
+    """Input for finding documents by word prefix."""
+    prefix: str = Field(description="The start of a word, e.g. 'summar' to match 'summary' or 'summarise'")
+
+class FuzzySearchInput(BaseModel):
+    """Input for finding documents by approximate keyword."""
+    keyword: str = Field(description="A word or phrase to look for; close spellings also match")
+
 class GetDocumentInput(BaseModel):
     """Input for retrievign document content."""
     document_id: str = Field(description="The document ID (filename)")
+    offset: int = Field(default=0, ge=0, description="Character offset to start reading from")
+    limit: int = Field(default=8000, gt=0, description="Maximum number of characters to return")
 
-load_dotenv('.env.local')
-
-llm = ChatAnthropic(
-    model="claude-sonnet-4-5-20250929",
-    api_key=os.environ.get("ANTHROPIC_API_KEY"),
-    temperature=0
-)
-
-class DocumentStore:
-    def __init__(self):
-        self.documents = {}
-        self.metadata = {}
-
-    def add_document(self, document_id: str, content: str, filepath: str):
-        self.documents[document_id] = content
-        self.metadata[document_id] = {
-            "filepath": filepath,
-            "upload_time": datetime.now().isoformat(),
-            "length": len(content),
-            "type": filepath.split('.')[-1]
-        }
-
-    def get_document(self, document_id: str) -> Optional[str]:
-        return self.documents.get(document_id)
-
-    def get_metadata(self, document_id: str) -> Optional[Dict[str, Any]]:
-        return self.metadata.get(document_id)
-
-    def list_documents(self) -> List[str]:
-        return list(self.documents.keys())
-
-    def search_documents(self, keyword: str) -> List[str]:
-        matches = []
-        for doc_id, content in self.documents.items():
-            if keyword.lower() in content.lower():
-                matches.append(doc_id)
-        return matches
-    
+class GetDocumentChunkInput(BaseModel):
+    """Input for retrieving one chunk of a document."""
+    document_id: str = Field(description="The document ID (filename)")
+    chunk_index: int = Field(default=0, description="Index of the chunk to return, starting at 0")
+
+@lru_cache(maxsize=1)
+def get_llm():
+    # Built once per process so the client's HTTP connection pool is reused across calls.
+    # Imported here so starting up doesn't pay for the Anthropic SDK until the agent first runs.
+    from langchain_anthropic import ChatAnthropic
+
+    return ChatAnthropic(
+        model="claude-sonnet-4-5-20250929",
+        api_key=os.environ.get("ANTHROPIC_API_KEY"),
+        temperature=0,
+        max_retries=2,
+        timeout=60,
+    )
+
+WHITESPACE_RE = re.compile(r"\s+")
 
 doc_store = DocumentStore()
 
+PREVIEW_LENGTH = 500
+
+def _format_time(ns: int) -> str:
+    return datetime.fromtimestamp(ns / 1e9).isoformat(timespec="seconds")
+
+def _tee_preview(pages: Iterable[str], preview: io.StringIO) -> Iterator[str]:
+    # Copy the start of the joined text into preview as pages stream past to the store
+    for page_no, page in enumerate(pages):
+        if page_no and preview.tell() < PREVIEW_LENGTH:
+            preview.write("\n")
+        remaining = PREVIEW_LENGTH - preview.tell()
+        if remaining > 0:
+            preview.write(page[:remaining])
+        yield page
+
 def load_document(filepath: str):
     try:
-        if filepath.endswith('.txt'):
-            loader = TextLoader(filepath)
-        elif filepath.endswith('.pdf'):
-            loader = PyPDFLoader(filepath)
-        elif filepath.endswith('.docx'):
-            loader = UnstructuredWordDocumentLoader(filepath)
-        elif filepath.endswith('.csv'):
-            loader = CSVLoader(filepath)
-        else:
-            loader = TextLoader(filepath)
-
-        documents = loader.load()
-
-        text = "\n".join([doc.page_content for doc in documents])
-
-                # Store in memory
+        preview = io.StringIO()
+        pages = _tee_preview(read_pages(filepath), preview)
+
+        # Stream pages straight into the on-disk shard
         doc_id = os.path.basename(filepath)
-        doc_store.add_document(doc_id, text, filepath)
+        doc_store.add_document(doc_id, pages, filepath)
         
         metadata = doc_store.get_metadata(doc_id)
         
         return f"""Document loaded successfully!
             
                 ID: {doc_id}
-                Type: {metadata['type']}
-                Size: {metadata['length']} characters
-                Upload Time: {metadata['upload_time']}
+                Type: {metadata.type}
+                Size: {metadata.length} characters
+                Upload Time: {_format_time(metadata.upload_time)}
 
-                Preview (first 500 chars):
-                {text[:500]}..."""
+                Preview (first {PREVIEW_LENGTH} chars):
+                {WHITESPACE_RE.sub(" ", preview.getvalue())}..."""
     except Exception as e:
         return f"Error loading document: {str(e)}"
 
 
-def list_loaded_documents(input: str=""):
-    docs = doc_store.list_documents()
-    if not docs: 
-        return "No documents loaded yet."
+def load_documents_batch(filepaths: List[str]):
+    if not filepaths:
+        return "No filepaths given."
+
+    lines = ["Batch Load Results:", ""]
+    try:
+        with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(filepaths))) as executor:
+            for filepath, pages, error in executor.map(load_pages, filepaths, chunksize=4):
+                if error is not None:
+                    lines.append(f"- {filepath}: Error loading document: {error}")
+                    continue
+                doc_id = os.path.basename(filepath)
+                try:
+                    doc_store.add_document(doc_id, pages, filepath)
+                except Exception as e:
+                    lines.append(f"- {filepath}: Error storing document: {str(e)}")
+                    continue
+                meta = doc_store.get_metadata(doc_id)
+                lines.append(f"- {doc_id} ({meta.type}, {meta.length} chars)")
+    except Exception as e:
+        return f"Error loading documents: {str(e)}"
+    return "\n".join(lines)
+
 
-    result = "Loaded Documents:\n"
+def _describe_documents(title: str, rows: Iterable[tuple]) -> str:
+    lines = [title, ""]
+    for doc_id, filetype, length, upload_time in rows:
+        lines.append(f"- {doc_id} ({filetype}, {length} chars, loaded: {_format_time(upload_time)})")
+    return "\n".join(lines)
 
-    for doc_id in docs:
-        meta = doc_store.get_metadata(doc_id)
-        result += f"\n- {doc_id} ({meta['type']}, {meta['length']} chars, loaded: {meta['upload_time']})"
-    return result
+def list_loaded_documents(input: str=""):
+    if len(doc_store) == 0: 
+        return "No documents loaded yet."
+    return _describe_documents("Loaded Documents:", doc_store.rows())
 
 def search_documents(keyword: str):
     docs = doc_store.search_documents(keyword)
     if not docs:
         return "No documents found."
-    
-    result = "Search Results:\n"
-    for doc_id in docs:
-        meta = doc_store.get_metadata(doc_id)
-        result += f"\n- {doc_id} ({meta['type']}, {meta['length']} chars, loaded: {meta['upload_time']})"
-    return result
-
-def get_document_content(document_id: str) -> str: 
-    content = doc_store.get_document(document_id)
-    if content is None:
+    return _describe_documents("Search Results:", doc_store.rows(docs))
+
+def search_documents_by_prefix(prefix: str):
+    docs = doc_store.prefix_search(prefix)
+    if not docs:
+        return "No documents found."
+    return _describe_documents("Search Results:", doc_store.rows(docs))
+
+def fuzzy_search_documents(keyword: str):
+    docs = doc_store.fuzzy_search(keyword)
+    if not docs:
+        return "No documents found."
+    return _describe_documents("Search Results:", doc_store.rows(docs))
+
+def get_document_content(document_id: str, offset: int = 0, limit: int = 8000) -> str: 
+    meta = doc_store.get_metadata(document_id)
+    if meta is None:
+        return f"Document {document_id} not found. Use list_loaded_documents to see all loaded documents."
+
+    if offset < 0 or limit <= 0:
+        return f"Invalid range: offset must be 0 or more and limit must be positive (got offset={offset}, limit={limit})."
+    if meta.length == 0:
+        return f"Document {document_id} is empty."
+    if offset >= meta.length:
+        return f"Offset {offset} is past the end of document {document_id} (length {meta.length})."
+
+    # Read only the requested range, not the whole document
+    end = min(offset + limit, meta.length)
+    text = doc_store.read(document_id, offset, end)
+    if end < meta.length:
+        text += f"\n\n[Showing characters {offset}-{end} of {meta.length}. Use offset={end} to read more.]"
+    return text
+
+def get_document_chunk(document_id: str, chunk_index: int = 0) -> str:
+    spans = doc_store.get_chunk_spans(document_id)
+    if spans is None:
         return f"Document {document_id} not found. Use list_loaded_documents to see all loaded documents."
-    return content
+    if not spans:
+        return f"Document {document_id} is empty."
+    if not 0 <= chunk_index < len(spans):
+        return f"Chunk {chunk_index} is out of range. Document {document_id} has chunks 0-{len(spans) - 1}."
+
+    start, end = spans[chunk_index]
+    return f"[Chunk {chunk_index} of 0-{len(spans) - 1}]\n{doc_store.read(document_id, start, end)}"
     
 
-tools = [
-      StructuredTool.from_function(
-          name="load_document",
-          func=load_document,
-          description="Load a document from a filepath. Input should be the full filepath as a string. Returns confirmation with  document ID and preview.",
-          args_schema=LoadDocumentInput
-      ),
-      Tool(
-          name="list_documents",
-          func=list_loaded_documents,
-          description="List all currently loaded documents with their metadata. No input required."
-      ),
-      StructuredTool.from_function(
-          name="get_document_content",
-          func=get_document_content,
-          description="Get the full content of a loaded document. Input should be the document ID (filename). Use this to read and analyze document contents.",
-          args_schema=GetDocumentInput,
-      ),
-  ]
-
-prompt = ChatPromptTemplate.from_messages([
-    ("system", """You are a helpful assistant that can load documents. You can:
+TOOL_LOG_LIMIT = 1024
+
+SYSTEM_PROMPT = """You are a helpful assistant that can load documents. You can:
     - Load a document from a filepath.
+    - Load several documents at once from a list of filepaths.
     - List loaded documents.
+    - Find loaded documents by the start of a word.
+    - Find loaded documents mentioning something close to a keyword.
     - Retrieve and analyze document content.
     - Answer questions about the documents.
     - Provide summaries, key insights, and extract specific information.
@@ -162,21 +195,105 @@ prompt = ChatPromptTemplate.from_messages([
     When a user asks you to analyze a document:
     1. First check if it's already loaded (use list_documents).
     2. If it's not loaded, load it using the filepath provided.
-    3. Retrieve the content using get_document_content.
+    3. Retrieve the content using get_document_content, or get_document_chunk for long documents.
     4. Provide your analysis based on what the user asked for.
 
-    Be thorough and cite specific parts of the document in your analysis. """),
-    ("human", "{input}"),
-    MessagesPlaceholder(variable_name="agent_scratchpad"),
-])
+    Be thorough and cite specific parts of the document in your analysis. """
+
+def _tool_callbacks(verbose: bool):
+    if not verbose:
+        return None
+    from langchain_core.callbacks import StdOutCallbackHandler
+
+    class TruncatingStdOutCallbackHandler(StdOutCallbackHandler):
+        """Prints tool calls like verbose mode, but cuts long tool output (e.g. whole documents) short."""
+        def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+            output = str(output)
+            if len(output) > TOOL_LOG_LIMIT:
+                output = f"{output[:TOOL_LOG_LIMIT]}... [{len(output) - TOOL_LOG_LIMIT} more chars]"
+            super().on_tool_end(output, **kwargs)
+
+    return [TruncatingStdOutCallbackHandler()]
+
+def build_tools(verbose: bool = False) -> list:
+    from langchain.tools import Tool, StructuredTool
+
+    callbacks = _tool_callbacks(verbose)
+    return [
+        StructuredTool.from_function(
+            name="load_document",
+            func=load_document,
+            description="Load a document from a filepath. Input should be the full filepath as a string. Returns confirmation with  document ID and preview.",
+            args_schema=LoadDocumentInput,
+            callbacks=callbacks,
+        ),
+        StructuredTool.from_function(
+            name="load_documents",
+            func=load_documents_batch,
+            description="Load several documents in parallel. Input should be a list of full filepaths. Returns one line per document with its ID and size, or the error for that file.",
+            args_schema=LoadDocumentsInput,
+            callbacks=callbacks,
+        ),
+        Tool(
+            name="list_documents",
+            func=list_loaded_documents,
+            description="List all currently loaded documents with their metadata. No input required.",
+            callbacks=callbacks,
+        ),
+        StructuredTool.from_function(
+            name="search_documents_by_prefix",
+            func=search_documents_by_prefix,
+            description="Find loaded documents containing a word that starts with the given prefix, ignoring case. Returns the matching documents with their metadata.",
+            args_schema=PrefixSearchInput,
+            callbacks=callbacks,
+        ),
+        StructuredTool.from_function(
+            name="fuzzy_search_documents",
+            func=fuzzy_search_documents,
+            description="Find loaded documents containing a passage that approximately matches the keyword, tolerating typos and spelling variants. Returns the matching documents, best match first.",
+            args_schema=FuzzySearchInput,
+            callbacks=callbacks,
+        ),
+        StructuredTool.from_function(
+            name="get_document_content",
+            func=get_document_content,
+            description="Get the content of a loaded document, up to limit characters starting at offset. Input should be the document ID (filename), optionally with offset and limit. Use this to read and analyze document contents.",
+            args_schema=GetDocumentInput,
+            callbacks=callbacks,
+        ),
+        StructuredTool.from_function(
+            name="get_document_chunk",
+            func=get_document_chunk,
+            description="Get one chunk of a loaded document, split on paragraph and sentence boundaries. Input should be the document ID (filename) and the chunk index, starting at 0. Use this to work through a long document piece by piece.",
+            args_schema=GetDocumentChunkInput,
+            callbacks=callbacks,
+        ),
+    ]
+
+@lru_cache(maxsize=1)
+def get_agent_executor():
+    # The agent is imported and wired up here rather than at module level: with the spawn and
+    # forkserver start methods, batch-load workers re-run this script as __mp_main__.
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-agent = create_tool_calling_agent(llm, tools, prompt)
-agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+    # Set AGENT_VERBOSE=1 to print the agent's reasoning and tool calls
+    verbose = os.environ.get("AGENT_VERBOSE") == "1"
+    tools = build_tools(verbose)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad"),
+    ])
+    agent = create_tool_calling_agent(get_llm(), tools, prompt)
+    return AgentExecutor(agent=agent, tools=tools, verbose=verbose)
 
 
 def main():
     print("Document analysis Agent started!")
     print("Type 'quit' to exit.\n")
+    load_dotenv('.env.local')
+    agent_executor = get_agent_executor()
 
     while True:
         user_input = input("\nYou: ").strip()
@@ -0,0 +1,104 @@
+import pytest
+
+import document_store
+from document_store import DocumentStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DocumentStore(shard_dir=str(tmp_path))
+    yield store
+    store.close()
+
+
+def test_fuzzy_search_ignores_pages_shorter_than_needle(store):
+    store.add_document("report.pdf", iter(["Quarterly revenue figures for the year", "3"]), "report.pdf")
+    assert store.fuzzy_search("budget 2023 forecast") == []
+
+
+def test_fuzzy_search_matches_close_spelling(store):
+    store.add_document("plan.txt", iter(["The budget 2023 forecast is attached."]), "plan.txt")
+    store.add_document("other.txt", iter(["Nothing relevant here at all."]), "other.txt")
+    assert store.fuzzy_search("budjet 2023 forcast") == ["plan.txt"]
+
+
+def test_fuzzy_search_matches_across_page_break(store):
+    store.add_document("plan.pdf", iter(["Summary of the budget 20", "23 forecast for next year"]), "plan.pdf")
+    assert store.fuzzy_search("budget 2023 forecast") == ["plan.pdf"]
+
+
+def test_reload_replaces_index_entries(store):
+    store.add_document("a.txt", iter(["alpha shared"]), "a.txt")
+    store.add_document("b.txt", iter(["beta shared"]), "b.txt")
+    store.add_document("a.txt", iter(["gamma shared"]), "a.txt")
+    assert store.search_documents("alpha") == []
+    assert "alpha" not in store.index
+    assert store.search_documents("gamma") == ["a.txt"]
+    assert store.search_documents("shared") == ["a.txt", "b.txt"]
+
+
+def test_rows_defaults_to_all_documents_in_load_order(store):
+    store.add_document("b.txt", iter(["bee"]), "b.txt")
+    store.add_document("a.csv", iter(["ay", "ay"]), "a.csv")
+    assert [row[:3] for row in store.rows()] == [("b.txt", "txt", 3), ("a.csv", "csv", 5)]
+    assert [row[0] for row in store.rows(["a.csv"])] == ["a.csv"]
+
+
+PAGES = ["Ünïcödé café", "", "plain ascii text", "naïve résumé — “quoted”", "x", "日本語のテキスト"]
+
+
+@pytest.mark.parametrize("segment_size", [1, 3, 7, 64])
+def test_read_matches_get_document_across_segments(store, monkeypatch, segment_size):
+    monkeypatch.setattr(document_store, "SEGMENT_SIZE", segment_size)
+    store.add_document("mixed.pdf", iter(PAGES), "mixed.pdf")
+    full = store.get_document("mixed.pdf")
+    assert full == "\n".join(PAGES)
+    assert store.get_metadata("mixed.pdf").length == len(full)
+    for start in range(len(full) + 2):
+        for end in range(start, len(full) + 3):
+            assert store.read("mixed.pdf", start, end) == full[start:end], (start, end)
+
+
+def test_read_crosses_default_segment_boundary(store):
+    page = "é" * (document_store.SEGMENT_SIZE - 2) + "boundary" + "ü" * 10
+    store.add_document("big.txt", iter([page, "next page"]), "big.txt")
+    full = store.get_document("big.txt")
+    start = document_store.SEGMENT_SIZE - 5
+    assert store.read("big.txt", start, start + 30) == full[start:start + 30]
+    assert store.read("big.txt", len(page) - 3, len(full)) == full[len(page) - 3:]
+
+
+def test_read_empty_and_unknown_documents(store):
+    store.add_document("empty.txt", iter([]), "empty.txt")
+    assert store.read("empty.txt", 0, 10) == ""
+    assert store.read("missing.txt", 0, 10) is None
+
+
+def _failing_pages():
+    yield "newtoken replacement text"
+    raise IOError("loader failed")
+
+
+def test_failed_reload_keeps_previous_version(store):
+    store.add_document("doc.txt", iter(["original words", "second page"]), "doc.txt")
+    before = store.get_metadata("doc.txt")
+
+    with pytest.raises(IOError):
+        store.add_document("doc.txt", _failing_pages(), "doc.txt")
+
+    assert store.get_document("doc.txt") == "original words\nsecond page"
+    assert store.read("doc.txt", 9, 20) == "words\nsecon"
+    assert store.get_metadata("doc.txt") == before
+    assert store.search_documents("original") == ["doc.txt"]
+    assert store.search_documents("newtoken") == []
+    assert "newtoken" not in store.index
+
+
+def test_failed_first_load_leaves_no_trace(store):
+    with pytest.raises(IOError):
+        store.add_document("new.txt", _failing_pages(), "new.txt")
+
+    assert len(store) == 0
+    assert store.get_document("new.txt") is None
+    assert "newtoken" not in store.index
+    assert store.conn.execute("SELECT COUNT(*) FROM segments").fetchone() == (0,)